@@ -1,36 +1,36 @@
-import requests
-import json
 import csv
-from bs4 import BeautifulSoup
 from datetime import datetime
 import os
+import shutil
 import gspread
 from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
+from otodom import SESSION, close_session, parse_next_data
 
 # Load environment variables
 load_dotenv()
 
 
-def get_existing_offers():
+def get_existing_offers(worksheet=None):
     """Get list of existing offer IDs from the spreadsheet"""
     try:
-        # Get configuration from environment variables
-        spreadsheet_id = os.getenv("SPREADSHEET_ID")
-        credentials_file = "service_account.json"
+        if worksheet is None:
+            # Get configuration from environment variables
+            spreadsheet_id = os.getenv("SPREADSHEET_ID")
+            credentials_file = "service_account.json"
 
-        if not spreadsheet_id:
-            print("Error: SPREADSHEET_ID not found in .env file")
-            return set()
+            if not spreadsheet_id:
+                print("Error: SPREADSHEET_ID not found in .env file")
+                return set()
 
-        # Authenticate with Google Sheets
-        gc = gspread.service_account(filename=credentials_file)
+            # Authenticate with Google Sheets
+            gc = gspread.service_account(filename=credentials_file)
 
-        # Open the spreadsheet
-        spreadsheet = gc.open_by_key(spreadsheet_id)
+            # Open the spreadsheet
+            spreadsheet = gc.open_by_key(spreadsheet_id)
 
-        # Select the first worksheet
-        worksheet = spreadsheet.sheet1
+            # Select the first worksheet
+            worksheet = spreadsheet.sheet1
 
         # Get all values from the offer_id column (column K)
         existing_offers = set(worksheet.col_values(11)[1:])  # Skip header row
@@ -42,8 +42,8 @@ def get_existing_offers():
         return set()
 
 
-def fetch_offers_list():
-    """Fetch list of offers from Otodom"""
+def fetch_offers_list(existing_offers):
+    """Fetch list of offers from Otodom, skipping ones already in the spreadsheet"""
     url = "https://www.otodom.pl/pl/wyniki/wynajem/mieszkanie/mazowieckie/warszawa/warszawa/warszawa"
 
     params = {
@@ -58,23 +58,15 @@ def fetch_offers_list():
         "viewType": "listing",
     }
 
-    headers = {
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
-    }
-
     try:
-        response = requests.get(url, params=params, headers=headers)
+        response = SESSION.get(url, params=params)
         response.raise_for_status()
 
-        soup = BeautifulSoup(response.text, "html.parser")
-        data = json.loads(soup.find("script", id="__NEXT_DATA__").text.strip())
+        data = parse_next_data(response.content)
 
         # Extract offers from the response using the correct path
         offers = data["props"]["pageProps"]["data"]["searchAds"]["items"]
 
-        # Get existing offers from spreadsheet
-        existing_offers = get_existing_offers()
-
         # Filter out offers that are already in the spreadsheet
         new_offers = []
         for offer in offers:
@@ -106,15 +98,10 @@ def save_slugs_to_csv(slugs):
         with open(output_filename, "w", newline="") as csvfile:
             writer = csv.writer(csvfile)
             writer.writerow(["slug"])  # Header
-            for slug in slugs:
-                writer.writerow([slug])
+            writer.writerows([slug] for slug in slugs)
 
-        # Save to current directory with constant name
-        with open(current_filename, "w", newline="") as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(["slug"])  # Header
-            for slug in slugs:
-                writer.writerow([slug])
+        # Copy to current directory with constant name
+        shutil.copyfile(output_filename, current_filename)
 
         print(
             f"Saved {len(slugs)} new slugs to {output_filename} and {current_filename}"
@@ -127,8 +114,14 @@ def save_slugs_to_csv(slugs):
 
 
 def main():
+    # Read existing offers from spreadsheet once
+    existing_offers = get_existing_offers()
+
     print("Fetching offers from Otodom...")
-    slugs = fetch_offers_list()
+    try:
+        slugs = fetch_offers_list(existing_offers)
+    finally:
+        close_session()
 
     if not slugs:
         print("No new offers found or error occurred")
@@ -141,12 +134,7 @@ def main():
 
     if csv_file:
         print("\nTo process these offers, run:")
-        print(
-            f"cat {csv_file} | tail -n +2 | xargs -I {{}} python otodom_parser.py {{}}"
-        )
-        print("\nOr process them one by one:")
-        for slug in slugs:
-            print(f"python otodom_parser.py {slug}")
+        print(f"uv run python3 parse_offers.py {csv_file}")
 
 
 if __name__ == "__main__":
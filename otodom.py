@@ -0,0 +1,61 @@
+import orjson
+import re
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Browser-like headers sent with every otodom.pl request
+HEADERS = {
+    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    # Compressed pages are several times smaller, br is decoded by the brotli package
+    "accept-encoding": "gzip, deflate, br",
+    "accept-language": "en-US,en;q=0.9",
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
+}
+
+# Next.js embeds page data as JSON in this script tag
+_NEXT_DATA_RE = re.compile(
+    rb'<script id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+
+# Retry policy for otodom.pl requests: rate limits and server errors are retried
+# with exponential backoff (backoff * 2^attempt seconds)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+# Shared HTTP session for all otodom.pl requests (keep-alive + connection pool)
+SESSION = requests.Session()
+SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=32,
+        max_retries=Retry(
+            total=MAX_RETRIES,
+            backoff_factor=RETRY_BACKOFF,
+            status_forcelist=RETRY_STATUSES,
+        ),
+    ),
+)
+SESSION.headers.update(HEADERS)
+
+
+def close_session():
+    """Close the shared session and release pooled connections"""
+    SESSION.close()
+
+
+def parse_next_data(content):
+    """Extract the __NEXT_DATA__ JSON payload from raw page bytes"""
+    match = _NEXT_DATA_RE.search(content)
+    if match:
+        try:
+            return orjson.loads(match.group(1))
+        except ValueError:
+            pass
+
+    # Fall back to a full HTML parse if the markup doesn't match
+    soup = BeautifulSoup(content, "html.parser")
+    return orjson.loads(soup.find("script", id="__NEXT_DATA__").text.strip())
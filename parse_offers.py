@@ -1,13 +1,31 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+import aiohttp
+import argparse
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import csv
+import diskcache
+import functools
+import hashlib
+import io
+import numpy as np
+import orjson
 import sys
-from math import radians, sin, cos, sqrt, atan2
+import time
+from math import radians, sin, cos
 from metro_stations import warsaw_metro_stations
+from otodom import (
+    HEADERS,
+    MAX_RETRIES,
+    RETRY_BACKOFF,
+    RETRY_STATUSES,
+    parse_next_data,
+)
+from fetch_offers import get_existing_offers
 import gspread
 from google.oauth2.service_account import Credentials
 from googlemaps import Client
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 import os
 import dspy
@@ -21,6 +39,17 @@ load_dotenv()
 # Initialize OpenAI
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+# On-disk cache shared between runs
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+gmaps_cache = diskcache.Cache(os.path.join(CACHE_DIR, "gmaps"))
+
+# Travel times are refreshed monthly so metro routing changes get picked up
+TRAVEL_TIMES_TTL = 30 * 24 * 60 * 60
+
+# Offer pages are downloaded at most once a day
+OFFERS_CACHE_DIR = Path(CACHE_DIR) / "offers"
+OFFER_TTL = 24 * 60 * 60
+
 
 # Define DSPy signature for offer analysis
 class OfferAnalysis(dspy.Signature):
@@ -50,106 +79,216 @@ class OfferAnalyzer(dspy.Module):
     def forward(self, description):
         return self.analyzer(description=description)
 
+    async def aforward(self, description):
+        return await self.analyzer.acall(description=description)
+
+
+@functools.lru_cache(maxsize=1)
+def _gspread_client(credentials_file):
+    """Authenticate with Google Sheets once per process"""
+    return gspread.service_account(filename=credentials_file)
+
+
+@functools.lru_cache(maxsize=1)
+def _worksheet(spreadsheet_id, credentials_file):
+    """Open the first worksheet of the spreadsheet once per process"""
+    return _gspread_client(credentials_file).open_by_key(spreadsheet_id).sheet1
+
+
+@functools.lru_cache(maxsize=1)
+def _gmaps_client(api_key):
+    """Create Google Maps client once per process"""
+    return Client(key=api_key)
+
+
+@functools.lru_cache(maxsize=1)
+def _llm_cache():
+    """Open on-disk cache of LLM analyses once per process, only when LLM is used"""
+    return diskcache.Cache(os.path.join(CACHE_DIR, "llm"))
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    """Calculate distance between two points using Haversine formula"""
-    R = 6371  # Earth's radius in kilometers
 
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
+@functools.lru_cache(maxsize=1)
+def _dspy_analyzer():
+    """Configure DSPy with OpenAI and create analyzer once per process"""
+    lm = dspy.LM("openai/gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY"))
+    dspy.configure(lm=lm)
+    return OfferAnalyzer()
 
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    distance = R * c
 
-    return distance
+EARTH_RADIUS_KM = 6371
+MAX_METRO_DISTANCE_KM = 1.0
 
+# Haversine `a` at the max distance: d = 2R * asin(sqrt(a)) <=> a = sin(d / 2R)^2
+_MAX_METRO_A = sin(MAX_METRO_DISTANCE_KM / (2 * EARTH_RADIUS_KM)) ** 2
+
+
+# Station coordinates in radians, precomputed once for vectorized Haversine
+_STATION_NAMES = list(warsaw_metro_stations)
+_STATION_LAT = np.radians([warsaw_metro_stations[n][0] for n in _STATION_NAMES])
+_STATION_LON = np.radians([warsaw_metro_stations[n][1] for n in _STATION_NAMES])
+_STATION_COS_LAT = np.cos(_STATION_LAT)
+
+
+def _haversine_a(lat, lon):
+    """Haversine `a` term between given coordinates and every metro station"""
+    lat, lon = radians(lat), radians(lon)
+    dlat = _STATION_LAT - lat
+    dlon = _STATION_LON - lon
+
+    return np.sin(dlat / 2) ** 2 + cos(lat) * _STATION_COS_LAT * np.sin(dlon / 2) ** 2
+
+
+# Distance Matrix accepts up to 25 destinations per request
+MAX_DESTINATIONS = 25
+
+
+def get_travel_time(gmaps_client, origin, destinations, mode):
+    """Get travel times from origin to each destination for a single mode using Google Maps Distance Matrix API"""
+    result = gmaps_client.distance_matrix(
+        origins=[origin],
+        destinations=destinations,
+        mode=mode,
+        departure_time=datetime.now(),
+    )
 
-def find_closest_metro_station(lat, lon):
-    """Find the closest metro station to given coordinates"""
-    closest_station = None
-    min_distance = float("inf")
+    return [
+        element["duration"]["text"] if element["status"] == "OK" else "N/A"
+        for element in result["rows"][0]["elements"]
+    ]
 
-    for station, (station_lat, station_lon) in warsaw_metro_stations.items():
-        distance = calculate_distance(lat, lon, station_lat, station_lon)
-        if distance < min_distance:
-            min_distance = distance
-            closest_station = station
 
-    return closest_station
+def travel_times_key(origin, destination):
+    """Cache key of a route, nearby offers share it thanks to rounding"""
+    return (
+        "travel_times",
+        round(origin[0], 4),
+        round(origin[1], 4),
+        round(destination[0], 4),
+        round(destination[1], 4),
+    )
 
 
-def get_travel_times(gmaps_client, origin_lat, origin_lon, dest_lat, dest_lon):
-    """Get travel times using Google Maps Distance Matrix API"""
+def get_travel_times(gmaps_client, routes):
+    """Get walking and transit travel times of (station, offer) routes, cached on disk by rounded coordinates"""
+    travel_times = {}
+
+    # Deduplicate routes and group uncached ones by station
+    missing = {}
+    for origin, destination in routes:
+        key = travel_times_key(origin, destination)
+        if key in travel_times:
+            continue
+        cached = gmaps_cache.get(key)
+        if cached is not None:
+            travel_times[key] = cached
+        else:
+            missing.setdefault(origin, {}).setdefault(key, destination)
+
+    # One request per station (and per mode) for up to 25 offers at once
+    for origin, destinations in missing.items():
+        keys = list(destinations)
+        for i in range(0, len(keys), MAX_DESTINATIONS):
+            chunk = keys[i : i + MAX_DESTINATIONS]
+            chunk_destinations = [destinations[key] for key in chunk]
+            try:
+                # API needs a separate call per mode, run both at once
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    walking = executor.submit(
+                        get_travel_time,
+                        gmaps_client,
+                        origin,
+                        chunk_destinations,
+                        "walking",
+                    )
+                    transit = executor.submit(
+                        get_travel_time,
+                        gmaps_client,
+                        origin,
+                        chunk_destinations,
+                        "transit",
+                    )
+                    chunk_travel_times = zip(walking.result(), transit.result())
+            except Exception as e:
+                print(f"Error getting travel times: {str(e)}")
+                continue
+
+            for key, route_travel_times in zip(chunk, chunk_travel_times):
+                travel_times[key] = route_travel_times
+
+                # Non-OK statuses (e.g. no transit at night) are re-queried next run
+                if "N/A" not in route_travel_times:
+                    gmaps_cache.set(key, route_travel_times, expire=TRAVEL_TIMES_TTL)
+
+    return travel_times
+
+
+def load_cached_offer(slug):
+    """Load offer details saved by an earlier run, None if missing or stale"""
+    cache_path = OFFERS_CACHE_DIR / f"{slug}.json"
     try:
-        # Get walking directions
-        walking_result = gmaps_client.distance_matrix(
-            origins=[(origin_lat, origin_lon)],
-            destinations=[(dest_lat, dest_lon)],
-            mode="walking",
-            departure_time=datetime.now(),
-        )
+        if time.time() - cache_path.stat().st_mtime > OFFER_TTL:
+            return None
+        return orjson.loads(cache_path.read_bytes())
+    except (OSError, ValueError):
+        return None
 
-        # Get transit directions
-        transit_result = gmaps_client.distance_matrix(
-            origins=[(origin_lat, origin_lon)],
-            destinations=[(dest_lat, dest_lon)],
-            mode="transit",
-            departure_time=datetime.now(),
-        )
 
-        # Extract walking time
-        walking_time = (
-            walking_result["rows"][0]["elements"][0]["duration"]["text"]
-            if walking_result["rows"][0]["elements"][0]["status"] == "OK"
-            else "N/A"
-        )
+def save_cached_offer(slug, data):
+    """Save offer details so re-runs don't download the page again"""
+    OFFERS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    (OFFERS_CACHE_DIR / f"{slug}.json").write_bytes(orjson.dumps(data))
 
-        # Extract transit time
-        transit_time = (
-            transit_result["rows"][0]["elements"][0]["duration"]["text"]
-            if transit_result["rows"][0]["elements"][0]["status"] == "OK"
-            else "N/A"
-        )
 
-        return walking_time, transit_time
-    except Exception as e:
-        print(f"Error getting travel times: {str(e)}")
-        return "N/A", "N/A"
+async def fetch_offer_page(session, url):
+    """Download an offer page, retrying rate limits and server errors with backoff"""
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            async with session.get(url) as response:
+                if last_attempt or response.status not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return await response.read()
+        except aiohttp.ClientConnectionError:
+            if last_attempt:
+                raise
+
+        await asyncio.sleep(RETRY_BACKOFF * 2**attempt)
+
 
+async def fetch_offer_details(session, slug):
+    """Fetch offer details from Otodom, cached on disk for a day"""
+    data = load_cached_offer(slug)
+    if data is not None:
+        return data
 
-def fetch_offer_details(slug):
-    """Fetch offer details from Otodom"""
     url = f"https://www.otodom.pl/pl/oferta/{slug}"
-    headers = {
-        "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-        "accept-language": "en-US,en;q=0.9",
-        "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/136.0.0.0 Safari/537.36",
-    }
 
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.text, "html.parser")
+    content = await fetch_offer_page(session, url)
 
-    # Extract data from the script tag
-    data = json.loads(soup.find("script", id="__NEXT_DATA__").text.strip())
-    return data
+    # Parsing is blocking, keep it off the event loop
+    loop = asyncio.get_running_loop()
+    data = await loop.run_in_executor(None, parse_next_data, content)
 
+    # Removed or redirected offers still render a page, don't cache those
+    if not data.get("props", {}).get("pageProps", {}).get("ad"):
+        raise ValueError("page has no offer data (removed or redirected?)")
 
-def analyze_offer_with_llm(description):
-    """Analyze the offer description using DSPy and OpenAI"""
-    try:
-        # Initialize DSPy with OpenAI
-        lm = dspy.LM("openai/gpt-4o-mini", api_key=os.getenv("OPENAI_API_KEY"))
-        dspy.configure(lm=lm)
+    save_cached_offer(slug, data)
+    return data
 
-        # Create analyzer instance
-        analyzer = OfferAnalyzer()
 
-        # Get analysis
-        result = analyzer(description=description)
+async def analyze_offer_with_llm(semaphore, description):
+    """Analyze the offer description using DSPy and OpenAI, cached by description"""
+    key = hashlib.sha256(description.encode()).hexdigest()
+    cached = _llm_cache().get(key)
+    if cached is not None:
+        return cached
 
-        return {
+    try:
+        async with semaphore:
+            result = await _dspy_analyzer().acall(description=description)
+
+        llm_analysis = {
             "available_from": result.available_from,
             "total_monthly_cost": result.total_monthly_cost,
             "key_advantages": result.key_advantages,
@@ -162,114 +301,65 @@ def analyze_offer_with_llm(description):
             "key_advantages": "Error in analysis",
         }
 
+    _llm_cache().set(key, llm_analysis)
+    return llm_analysis
+
+
+async def analyze_offers_with_llm(all_offer_data, concurrency=8):
+    """Analyze descriptions of all offers concurrently and add results to their data"""
+    semaphore = asyncio.Semaphore(concurrency)
+    llm_analyses = await asyncio.gather(
+        *(
+            analyze_offer_with_llm(semaphore, offer_data["description"])
+            for offer_data in all_offer_data
+        )
+    )
+
+    for offer_data, llm_analysis in zip(all_offer_data, llm_analyses):
+        offer_data.update(llm_analysis)
+
 
 def should_process_offer(lat, lon):
     """Check if the offer meets the filtering criteria"""
-    # Find closest metro station
-    closest_station = find_closest_metro_station(lat, lon)
+    # Find closest metro station, distance grows monotonically with `a`
+    a = _haversine_a(lat, lon)
+    closest = int(np.argmin(a))
+    closest_station = _STATION_NAMES[closest]
     station_coords = warsaw_metro_stations[closest_station]
 
-    # Calculate distance to closest metro
-    distance = calculate_distance(lat, lon, station_coords[0], station_coords[1])
-
-    # Process only if within 1km of metro
-    return distance <= 1.0, closest_station, station_coords
+    # Process only if within 1km of metro, compared on `a` to skip atan2/sqrt
+    return bool(a[closest] <= _MAX_METRO_A), closest_station, station_coords
 
 
-def extract_offer_data(data, gmaps_client):
-    """Extract relevant data from the parsed JSON"""
+def parse_offer(data):
+    """Extract relevant data from the parsed JSON, returns it with the (station, offer) route or None if too far from metro"""
     ad = data["props"]["pageProps"]["ad"]
 
+    # Index characteristics by key instead of relying on their order
+    characteristics = {char["key"]: char for char in ad["characteristics"]}
+
     # Get coordinates
     lat = ad["location"]["coordinates"]["latitude"]
     lon = ad["location"]["coordinates"]["longitude"]
 
+    # Get address parts
+    address = ad["location"]["address"]
+    street = address["street"]["name"]
+    district = address["district"]["name"]
+    city = address["city"]["name"]
+
     # Check if offer meets filtering criteria
     should_process, closest_station, station_coords = should_process_offer(lat, lon)
-
-    # Initialize API-related fields with default values
-    walking_time = "N/A"
-    transit_time = "N/A"
-    available_from = "N/A"
-    total_monthly_cost = "N/A"
-    key_advantages = "N/A"
-
-    # Only invoke APIs if offer meets criteria
-    if should_process:
-        # Get travel times
-        walking_time, transit_time = get_travel_times(
-            gmaps_client, station_coords[0], station_coords[1], lat, lon
-        )
-
-        # Create comprehensive description for LLM analysis
-        description_parts = []
-
-        # Basic information
-        description_parts.append(f"Title: {ad['title']}")
-        description_parts.append(
-            f"Location: {ad['location']['address']['city']['name']}, {ad['location']['address']['district']['name']}"
-        )
-        description_parts.append(
-            f"Address: {ad['location']['address']['street']['name']}"
-        )
-        description_parts.append(f"Closest Metro: {closest_station}")
-        description_parts.append(f"Walking time from metro: {walking_time}")
-        description_parts.append(f"Transit time from metro: {transit_time}")
-
-        # Property details
-        description_parts.append("\nProperty Details:")
-        for char in ad["characteristics"]:
-            if char["key"] not in [
-                "price",
-                "rent",
-                "m",
-            ]:  # Skip these as they're handled separately
-                description_parts.append(f"- {char['label']}: {char['localizedValue']}")
-
-        # Features
-        if ad["features"]:
-            description_parts.append("\nFeatures:")
-            for feature in ad["features"]:
-                description_parts.append(f"- {feature}")
-
-        # Additional information
-        description_parts.append("\nAdditional Information:")
-        description_parts.append(f"- Advertiser Type: {ad['advertiserType']}")
-        description_parts.append(f"- Created: {ad['createdAt']}")
-        description_parts.append(f"- Modified: {ad['modifiedAt']}")
-
-        # Original description
-        description_parts.append("\nDescription:")
-        description_parts.append(ad["description"])
-
-        # Combine all parts
-        comprehensive_description = "\n".join(description_parts)
-
-        # Analyze description with LLM
-        # llm_analysis = analyze_offer_with_llm(comprehensive_description)
-        llm_analysis = {
-            "available_from": "N/A",
-            "total_monthly_cost": "N/A",
-            "key_advantages": "N/A",
-        }
-        available_from = llm_analysis["available_from"]
-        total_monthly_cost = llm_analysis["total_monthly_cost"]
-        key_advantages = llm_analysis["key_advantages"]
-    else:
+    if not should_process:
         print(f"Skipping API calls for offer - too far from metro station")
-        comprehensive_description = ad["description"]
 
     # Get costs
-    base_cost = float(ad["characteristics"][0]["value"])  # Price
-    rent = float(ad["characteristics"][1]["value"])  # Rent
+    base_cost = float(characteristics["price"]["value"])  # Price
+    rent = float(characteristics.get("rent", {}).get("value") or 0)  # Rent, optional
     total_cost = base_cost + rent  # Total cost
 
     # Get area
-    area = "N/A"
-    for feature in ad["characteristics"]:
-        if feature["label"] == "Powierzchnia":
-            area = feature["value"]
-            break
+    area = characteristics.get("m", {}).get("value", "N/A")
 
     # Get full URL
     full_url = ad["url"]
@@ -278,90 +368,248 @@ def extract_offer_data(data, gmaps_client):
     offer_id = ad["id"]
     slug = ad["slug"]
 
-    # Get full address
-    address_parts = []
-    if ad["location"]["address"]["street"]["name"]:
-        address_parts.append(ad["location"]["address"]["street"]["name"])
-    if ad["location"]["address"]["district"]["name"]:
-        address_parts.append(ad["location"]["address"]["district"]["name"])
-    if ad["location"]["address"]["city"]["name"]:
-        address_parts.append(ad["location"]["address"]["city"]["name"])
-    full_address = ", ".join(address_parts)
-
-    return {
+    # Get full address, skipping missing parts
+    full_address = ", ".join(part for part in (street, district, city) if part)
+
+    # API-related fields have default values, travel times and LLM fields are
+    # filled in later for the whole batch
+    offer_data = {
         "closest_metro": closest_station,
         "base_cost": base_cost,
         "total_cost": total_cost,
         "full_url": full_url,
         "area": area,
         "address": full_address,
-        "walking_time": walking_time,
-        "transit_time": transit_time,
-        "description": comprehensive_description,
+        "walking_time": "N/A",
+        "transit_time": "N/A",
+        "description": ad["description"],
         "rent": rent,
         "offer_id": offer_id,
         "slug": slug,
-        "available_from": available_from,
-        "total_monthly_cost": total_monthly_cost,
-        "key_advantages": key_advantages,
+        "available_from": "N/A",
+        "total_monthly_cost": "N/A",
+        "key_advantages": "N/A",
+        "near_metro": should_process,
     }
+    route = (station_coords, (lat, lon)) if should_process else None
 
+    return offer_data, route
 
-def save_to_sheets(data, spreadsheet_id, credentials_file):
-    """Save data to Google Sheets using gspread"""
-    # Authenticate with Google Sheets
-    gc = gspread.service_account(filename=credentials_file)
-
-    # Open the spreadsheet
-    spreadsheet = gc.open_by_key(spreadsheet_id)
-
-    # Select the first worksheet
-    worksheet = spreadsheet.sheet1
-
-    # Determine if offer meets filtering criteria
-    meets_criteria = data["walking_time"] != "N/A"
-    status = "GREEN" if meets_criteria else "RED"
-
-    # Prepare the row data with rearranged columns
-    row_data = [
-        status,  # Color indicator column
-        data["closest_metro"],
-        data["base_cost"],
-        data["total_cost"],
-        data["full_url"],
-        data["area"],
-        data["address"],
-        data["walking_time"],
-        data["transit_time"],
-        data["rent"],
-        data["offer_id"],
-        data["slug"],
-        data["available_from"],
-        data["total_monthly_cost"],
-        data["key_advantages"],
-    ]
 
-    # Append the row to the worksheet
-    worksheet.append_row(row_data)
+def add_travel_times(offer_data, data, route, travel_times):
+    """Fill in travel times of an offer near metro and build its description for LLM analysis"""
+    ad = data["props"]["pageProps"]["ad"]
+    address = ad["location"]["address"]
+
+    # Get travel times fetched for the whole batch
+    walking_time, transit_time = travel_times.get(
+        travel_times_key(*route), ("N/A", "N/A")
+    )
 
-    # Apply color formatting to the first column
-    last_row = len(worksheet.get_all_values())
-    if meets_criteria:
-        worksheet.format(
-            f"A{last_row}", {"backgroundColor": {"red": 0.0, "green": 1.0, "blue": 0.0}}
+    # Create comprehensive description for LLM analysis
+    buffer = io.StringIO()
+    write = buffer.write
+
+    # Basic information
+    write(f"Title: {ad['title']}\n")
+    write(f"Location: {address['city']['name']}, {address['district']['name']}\n")
+    write(f"Address: {address['street']['name']}\n")
+    write(f"Closest Metro: {offer_data['closest_metro']}\n")
+    write(f"Walking time from metro: {walking_time}\n")
+    write(f"Transit time from metro: {transit_time}\n")
+
+    # Property details, skipping ones handled separately
+    write("\nProperty Details:\n")
+    write(
+        "".join(
+            f"- {char['label']}: {char['localizedValue']}\n"
+            for char in ad["characteristics"]
+            if char["key"] not in {"price", "rent", "m"}
         )
-    else:
-        worksheet.format(
-            f"A{last_row}", {"backgroundColor": {"red": 1.0, "green": 0.0, "blue": 0.0}}
+    )
+
+    # Features
+    if ad["features"]:
+        write("\nFeatures:\n")
+        write("".join(f"- {feature}\n" for feature in ad["features"]))
+
+    # Additional information
+    write("\nAdditional Information:\n")
+    write(f"- Advertiser Type: {ad['advertiserType']}\n")
+    write(f"- Created: {ad['createdAt']}\n")
+    write(f"- Modified: {ad['modifiedAt']}\n")
+
+    # Original description
+    write("\nDescription:\n")
+    write(ad["description"])
+
+    offer_data["walking_time"] = walking_time
+    offer_data["transit_time"] = transit_time
+    offer_data["description"] = buffer.getvalue()
+
+
+def save_many_to_sheets(all_offer_data, worksheet):
+    """Save data of all offers to Google Sheets using a single batched write"""
+    if not all_offer_data:
+        return
+
+    rows = []
+    formats = []
+    # Appended rows start right after the last filled row
+    first_row = len(worksheet.get_all_values()) + 1
+
+    for i, data in enumerate(all_offer_data):
+        # Determine if offer meets filtering criteria
+        meets_criteria = data["walking_time"] != "N/A"
+        status = "GREEN" if meets_criteria else "RED"
+
+        # Prepare the row data with rearranged columns
+        rows.append(
+            [
+                status,  # Color indicator column
+                data["closest_metro"],
+                data["base_cost"],
+                data["total_cost"],
+                data["full_url"],
+                data["area"],
+                data["address"],
+                data["walking_time"],
+                data["transit_time"],
+                data["rent"],
+                data["offer_id"],
+                data["slug"],
+                data["available_from"],
+                data["total_monthly_cost"],
+                data["key_advantages"],
+            ]
         )
 
+        # Color formatting of the first column
+        color = (
+            {"red": 0.0, "green": 1.0, "blue": 0.0}
+            if meets_criteria
+            else {"red": 1.0, "green": 0.0, "blue": 0.0}
+        )
+        formats.append(
+            {"range": f"A{first_row + i}", "format": {"backgroundColor": color}}
+        )
+
+    # Append all rows and apply formatting in one request each
+    worksheet.append_rows(rows)
+    worksheet.batch_format(formats)
+
+
+def read_slugs_from_csv(csv_file):
+    """Read offer slugs from a CSV file produced by fetch_offers.py"""
+    with open(csv_file, newline="") as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader, None)  # Skip header
+        return [row[0].strip() for row in reader if row and row[0].strip()]
+
+
+async def fetch_new_offer(session, semaphore, existing_offers, slug):
+    """Fetch details of a single offer, returns None on failure or if already saved"""
+    async with semaphore:
+        try:
+            data = await fetch_offer_details(session, slug)
+
+            # Skip offers already in the spreadsheet (or earlier in this batch)
+            offer_id = str(data["props"]["pageProps"]["ad"]["id"])
+            if offer_id in existing_offers:
+                print(f"Skipping offer {slug} - already in spreadsheet")
+                return None
+            existing_offers.add(offer_id)
+
+            return data
+        except Exception as e:
+            print(f"Error fetching offer {slug}: {str(e)}")
+            return None
+
+
+async def process_offers(
+    slugs, gmaps_client, existing_offers, concurrency=10, analyze_with_llm=False
+):
+    """Process all offers concurrently, returns data of successfully processed ones"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(headers=HEADERS) as session:
+        results = await asyncio.gather(
+            *(
+                fetch_new_offer(session, semaphore, existing_offers, slug)
+                for slug in slugs
+            )
+        )
+    offers = [(slug, data) for slug, data in zip(slugs, results) if data is not None]
+
+    # Parse offers first so only valid ones near metro cost Google Maps requests
+    parsed_offers = []
+    routes = []
+    for slug, data in offers:
+        try:
+            offer_data, route = parse_offer(data)
+        except Exception as e:
+            print(f"Error processing offer {slug}: {str(e)}")
+            continue
+        parsed_offers.append((slug, data, offer_data, route))
+        if route is not None:
+            routes.append(route)
+
+    # Query Google Maps once per unique route of offers near metro, Google Maps
+    # client is synchronous so run it in a worker thread
+    loop = asyncio.get_running_loop()
+    travel_times = await loop.run_in_executor(
+        None, get_travel_times, gmaps_client, routes
+    )
+
+    all_offer_data = []
+    for slug, data, offer_data, route in parsed_offers:
+        try:
+            if route is not None:
+                add_travel_times(offer_data, data, route, travel_times)
+            all_offer_data.append(offer_data)
+            print(f"Successfully processed offer: {slug}")
+        except Exception as e:
+            print(f"Error processing offer {slug}: {str(e)}")
+
+    # Analyze descriptions of offers near metro with LLM in one concurrent batch
+    if analyze_with_llm:
+        await analyze_offers_with_llm(
+            [offer_data for offer_data in all_offer_data if offer_data["near_metro"]]
+        )
+
+    return all_offer_data
+
+
+def parse_args():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description="Process Otodom offers listed in a CSV file and save them to Google Sheets"
+    )
+    parser.add_argument(
+        "csv_file", help="CSV file with offer slugs, e.g. current_offers.csv"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=10,
+        help="Maximum number of offers processed at once (default: 10)",
+    )
+    parser.add_argument(
+        "--llm",
+        action="store_true",
+        help="Analyze descriptions of offers near metro with OpenAI (requires OPENAI_API_KEY)",
+    )
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    return args
+
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python otodom_parser.py <offer_slug>")
-        sys.exit(1)
+    args = parse_args()
 
-    slug = sys.argv[1].strip()
     # Get configuration from environment variables
     spreadsheet_id = os.getenv("SPREADSHEET_ID")
     google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
@@ -375,27 +623,33 @@ def main():
         print("Error: GOOGLE_MAPS_API_KEY not found in .env file")
         sys.exit(1)
 
+    if args.llm and not os.getenv("OPENAI_API_KEY"):
+        print("Error: OPENAI_API_KEY not found in .env file")
+        sys.exit(1)
+
     try:
-        # Initialize Google Maps client
-        gmaps_client = Client(key=google_maps_api_key)
+        slugs = read_slugs_from_csv(args.csv_file)
 
-        # Fetch and parse offer details
-        data = fetch_offer_details(slug)
+        worksheet = _worksheet(spreadsheet_id, credentials_file)
+        gmaps_client = _gmaps_client(google_maps_api_key)
 
-        # Extract relevant data
-        offer_data = extract_offer_data(data, gmaps_client)
+        # Read existing offers from spreadsheet once for the whole batch
+        existing_offers = get_existing_offers(worksheet)
 
-        if offer_data is None:
-            print(f"Skipping offer {slug} - does not meet filtering criteria")
-            sys.exit(0)
+        # Fetch and extract all offers concurrently
+        all_offer_data = asyncio.run(
+            process_offers(
+                slugs, gmaps_client, existing_offers, args.concurrency, args.llm
+            )
+        )
 
         # Save to Google Sheets
-        save_to_sheets(offer_data, spreadsheet_id, credentials_file)
+        save_many_to_sheets(all_offer_data, worksheet)
 
-        print(f"Successfully processed offer: {slug}")
+        print(f"Successfully saved {len(all_offer_data)} of {len(slugs)} offers")
 
     except Exception as e:
-        print(f"Error processing offer: {str(e)}")
+        print(f"Error processing offers: {str(e)}")
         sys.exit(1)
 
 
@@ -2,11 +2,12 @@
 
 # Check if CSV file is provided
 if [ $# -eq 0 ]; then
-    echo "Usage: $0 <csv_file>"
+    echo "Usage: $0 <csv_file> [--concurrency N]"
     exit 1
 fi
 
 CSV_FILE=$1
+shift
 
 # Check if file exists
 if [ ! -f "$CSV_FILE" ]; then
@@ -14,11 +15,6 @@ if [ ! -f "$CSV_FILE" ]; then
     exit 1
 fi
 
-# Skip header and process each slug
-tail -n +2 "$CSV_FILE" | while IFS=, read -r slug; do
-    echo "Processing offer: $slug"
-    uv run python3 parse_offers.py "$slug"
-    
-    # Add a small delay between requests to avoid overwhelming the server
-    sleep 2
-done
\ No newline at end of file
+# Process all slugs in a single batch run
+echo "Processing offers from: $CSV_FILE"
+uv run python3 parse_offers.py "$CSV_FILE" "$@"